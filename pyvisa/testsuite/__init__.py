@@ -7,23 +7,48 @@ import logging
 import warnings
 import unittest
 from contextlib import contextmanager
+from functools import lru_cache, wraps
 
 from logging.handlers import BufferingHandler
 
 from pyvisa import logger, ResourceManager
 
-try:
-    ResourceManager()
-except ValueError:
-    VISA_PRESENT = False
-else:
-    VISA_PRESENT = True
-
-require_visa_lib = (
-     unittest.skipUnless(VISA_PRESENT,
-                         "Requires an installed VISA library. Run on PyVISA "
-                         "buildbot.")
-)
+
+@lru_cache(maxsize=1)
+def visa_present():
+    """Check whether a VISA library can be opened.
+
+    The check is performed on first use so that merely importing the
+    testsuite does not attempt to load a VISA library.
+
+    """
+    try:
+        ResourceManager()
+    except ValueError:
+        return False
+    return True
+
+
+def require_visa_lib(func):
+    """Skip the decorated test method if no VISA library is installed.
+
+    Unlike unittest.skipUnless this can only decorate test methods, since the
+    skip happens when the test body runs, that is after setUp (whose failures
+    are hence reported before the skip).
+
+    """
+    if isinstance(func, type):
+        raise TypeError("require_visa_lib can only decorate test methods, "
+                        "not classes.")
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not visa_present():
+            self.skipTest("Requires an installed VISA library. Run on PyVISA "
+                          "buildbot.")
+        return func(self, *args, **kwargs)
+
+    return wrapper
 
 
 class TestHandler(BufferingHandler):
@@ -2,7 +2,11 @@
 """Test the behavior of the command line tools.
 
 """
-from subprocess import run, Popen, PIPE
+import io
+import runpy
+from contextlib import redirect_stdout
+from subprocess import run, PIPE
+from unittest import mock
 
 from pyvisa import util
 from pyvisa.cmd_line_tools import visa_main, visa_info, visa_shell
@@ -12,8 +16,23 @@ from . import BaseTestCase, require_visa_lib
 class TestCmdLineTools(BaseTestCase):
     """Test the cmd line tools functions and scripts.
 
+    The functions are called in-process to avoid paying for the interpreter
+    startup, only the pyvisa-info script is run in a subprocess to check the
+    entry points are properly installed.
+
     """
 
+    def _call(self, func, argv, stdin=''):
+        """Call a command line tool function and return its output.
+
+        """
+        out = io.StringIO()
+        with mock.patch('sys.argv', argv), \
+                mock.patch('sys.stdin', io.StringIO(stdin)), \
+                redirect_stdout(out):
+            func()
+        return out.getvalue()
+
     @require_visa_lib
     def test_visa_main(self):
         """Test the visa scripts.
@@ -22,19 +41,32 @@ class TestCmdLineTools(BaseTestCase):
         should be removed too.
 
         """
-        result = run(["python", "-m", "visa", "info"], stdout=PIPE,
-                     universal_newlines=True)
+        output = self._call(self._run_visa_module, ["visa", "info"])
         details = util.system_details_to_str(util.get_system_details())
-        self.assertSequenceEqual(result.stdout.strip(), details.strip())
+        self.assertMultiLineEqual(output.strip(), details.strip())
+
+        output = self._call(self._run_visa_module, ["visa", "shell"],
+                            'exit\n')
+        self.assertIn("Welcome to the VISA shell", output)
 
-        with Popen(["python", "-m", "visa", "shell"],
-                   stdin=PIPE, stdout=PIPE) as p:
-            stdout, _ = p.communicate(b'exit')
-        self.assertIn(b"Welcome to the VISA shell", stdout)
+    def _run_visa_module(self):
+        """Run the deprecated visa module as a script.
+
+        """
+        with self.assertWarns(FutureWarning):
+            runpy.run_module("visa", run_name="__main__")
 
     def test_visa_info(self):
         """Test the visa info command line tool.
 
+        """
+        output = self._call(visa_info, ["pyvisa-info"])
+        details = util.system_details_to_str(util.get_system_details())
+        self.assertMultiLineEqual(output.strip(), details.strip())
+
+    def test_visa_info_script(self):
+        """Test the pyvisa-info console script is installed.
+
         """
         result = run('pyvisa-info', stdout=PIPE, universal_newlines=True)
         details = util.system_details_to_str(util.get_system_details())
@@ -46,7 +78,5 @@ class TestCmdLineTools(BaseTestCase):
         """Test the visa shell function.
 
         """
-        with Popen(["pyvisa-shell"],
-                   stdin=PIPE, stdout=PIPE) as p:
-            stdout, stderr = p.communicate(b'exit')
-        self.assertIn(b"Welcome to the VISA shell", stdout)
+        output = self._call(visa_shell, ["pyvisa-shell"], 'exit\n')
+        self.assertIn("Welcome to the VISA shell", output)